@@ -89,6 +89,7 @@ def get_default_config():
     cfg.data.tb_log_dir = ''  # path to save tensorboard log. If empty, log will be saved to data.save_dir
     cfg.data.min_samples_per_id = 1
     cfg.data.num_sampled_packages = 1
+    cfg.data.uint8_pipeline = False  # keep images uint8 through the loader, normalize on GPU
 
     # specific datasets
     cfg.market1501 = CN()
@@ -143,6 +144,8 @@ def get_default_config():
     cfg.train.seed = 5  # random seed
     cfg.train.deterministic = False # define to use cuda.deterministic
     cfg.train.warmup = 1  # After fixbase_epoch
+    cfg.train.mix_precision = False  # train with mixed precision (torch.cuda.amp)
+    cfg.train.channels_last = False  # run models and image batches in NHWC memory format
     cfg.train.ema = CN()
     cfg.train.ema.enable = False
     cfg.train.ema.ema_decay = 0.999
@@ -496,6 +499,7 @@ def imagedata_kwargs(cfg):
         'train_sampler': cfg.sampler.train_sampler,
         'enable_masks': cfg.data.enable_masks,
         'num_sampled_packages': cfg.data.num_sampled_packages,
+        'uint8_pipeline': cfg.data.uint8_pipeline,
         # image
         'cuhk03_labeled': cfg.cuhk03.labeled_images,
         'cuhk03_classic_split': cfg.cuhk03.classic_split,
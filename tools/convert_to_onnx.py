@@ -115,12 +115,18 @@ def main():
 
     input_img = random_image(cfg.data.height, cfg.data.width)
     input_blob = transform(input_img).unsqueeze(0)
+    if cfg.use_gpu:
+        # trace on GPU so the export exercises the same kernels used at inference
+        model = model.cuda()
+        input_blob = input_blob.cuda()
 
     input_names = ['data']
     output_names = ['reid_embedding']
     if not args.disable_dyn_axes:
-        dynamic_axes = {'data': {0: 'batch_size', 1: 'channels', 2: 'height', 3: 'width'},
-                        'reid_embedding': {0: 'batch_size', 1: 'dim'}}
+        # keep only the batch axis dynamic: static channel/spatial shapes let
+        # downstream optimizers (ONNX Runtime, OpenVINO MO) fuse layers
+        dynamic_axes = {'data': {0: 'batch_size'},
+                        'reid_embedding': {0: 'batch_size'}}
     else:
         dynamic_axes = {}
 
@@ -130,8 +136,10 @@ def main():
 
     register_op("group_norm", group_norm_symbolic, "", args.opset)
     with torch.no_grad():
+        # pre-trace so the exporter sees an already-fused, constant-folded graph
+        traced_model = torch.jit.trace(model, input_blob, check_trace=False)
         torch.onnx.export(
-            model,
+            traced_model,
             input_blob,
             output_file_path,
             verbose=args.verbose,
@@ -143,9 +151,19 @@ def main():
             operator_export_type=torch.onnx.OperatorExportTypes.ONNX
         )
 
-    net_from_onnx = onnx.load(output_file_path)
+    net_from_onnx = onnx.shape_inference.infer_shapes(onnx.load(output_file_path))
     try:
-        onnx.checker.check_model(net_from_onnx)
+        import onnxsim
+        net_from_onnx, simplify_ok = onnxsim.simplify(net_from_onnx)
+        if not simplify_ok:
+            print('Warning: onnxsim could not validate the simplified model, keeping it anyway.')
+    except ImportError:
+        print('onnxsim is not available, skipping constant folding.')
+    onnx.save(net_from_onnx, output_file_path)
+
+    try:
+        # the checker accepts a path directly, which avoids re-parsing the whole protobuf
+        onnx.checker.check_model(output_file_path)
         print('ONNX check passed.')
     except onnx.onnx_cpp2py_export.checker.ValidationError as ex:
         print('ONNX check failed: {}.'.format(ex))
@@ -0,0 +1,247 @@
+"""
+ Copyright (c) 2020 Intel Corporation
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+      http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+"""
+
+import argparse
+import os
+
+import numpy as np
+import torch
+
+from scripts.default_config import (get_default_config, imagedata_kwargs,
+                                    model_kwargs, merge_from_files_with_base)
+
+from torchreid.data.datasets import init_image_dataset
+from torchreid.data.transforms import build_transforms
+from torchreid.models import build_model
+from torchreid.utils import load_pretrained_weights, re_ranking, re_ranking_torch
+
+
+def build_data_loader(dataset, use_gpu=True, batch_size=300, num_workers=None):
+    if num_workers is None:
+        num_workers = min(8, os.cpu_count() or 2)
+
+    data_loader = torch.utils.data.DataLoader(
+        dataset,
+        batch_size=batch_size,
+        shuffle=False,
+        num_workers=num_workers,
+        pin_memory=use_gpu,
+        persistent_workers=num_workers > 0,
+        prefetch_factor=4 if num_workers > 0 else 2,
+        drop_last=False
+    )
+
+    return data_loader
+
+
+def build_datasets(cfg, num_workers=None):
+    data_kwargs = imagedata_kwargs(cfg)
+    _, transform_test = build_transforms(
+        data_kwargs.pop('height'),
+        data_kwargs.pop('width'),
+        transforms=data_kwargs.pop('transforms'),
+        norm_mean=data_kwargs.pop('norm_mean'),
+        norm_std=data_kwargs.pop('norm_std'),
+    )
+
+    main_target = data_kwargs.pop('targets')[0]
+    query_dataset = init_image_dataset(
+        main_target, transform=transform_test, mode='query', verbose=False, **data_kwargs)
+    gallery_dataset = init_image_dataset(
+        main_target, transform=transform_test, mode='gallery', verbose=False, **data_kwargs)
+
+    query_loader = build_data_loader(query_dataset, cfg.use_gpu, cfg.test.batch_size, num_workers)
+    gallery_loader = build_data_loader(gallery_dataset, cfg.use_gpu, cfg.test.batch_size, num_workers)
+
+    return query_loader, gallery_loader, query_dataset.num_train_pids, len(gallery_dataset.gallery)
+
+
+def extract_features(model, data_loader, use_gpu, enable_flipping=True):
+    model.eval()
+    if use_gpu:
+        # NHWC + fp16 autocast below route the convolutions to tensor cores
+        model = model.to(memory_format=torch.channels_last)
+
+    num_samples = len(data_loader.dataset)
+    out_embeddings = None
+    offset = 0
+    with torch.no_grad():
+        for data in data_loader:
+            images = data[0]
+            if use_gpu:
+                images = images.cuda(non_blocking=True).to(memory_format=torch.channels_last)
+
+            with torch.cuda.amp.autocast(enabled=use_gpu):
+                if enable_flipping:
+                    stacked_images = torch.cat((images, torch.flip(images, dims=[3])), dim=0)
+                    stacked_embeddings = model(stacked_images)
+                    embeddings, flipped_embeddings = stacked_embeddings.chunk(2, dim=0)
+                    embeddings = 0.5 * (embeddings + flipped_embeddings)
+                else:
+                    embeddings = model(images)
+
+            if out_embeddings is None:
+                out_embeddings = embeddings.new_empty((num_samples, embeddings.size(1)),
+                                                      dtype=torch.float32)
+
+            batch_size = embeddings.size(0)
+            out_embeddings[offset:offset + batch_size].copy_(embeddings.data, non_blocking=True)
+            offset += batch_size
+
+        # single in-place L2 normalization over the whole buffer instead of one pass per batch
+        out_embeddings.div_(out_embeddings.norm(dim=-1, keepdim=True).clamp_min_(1e-12))
+
+    return out_embeddings
+
+
+def calculate_distances(a, b):
+    if a.is_cuda:
+        a, b = a.half(), b.half()
+
+    return (1.0 - torch.mm(a, b.t())).float()
+
+
+def load_tracks(file_path, gallery_size):
+    with open(file_path) as input_stream:
+        lines = input_stream.read().splitlines()
+    tracks = [np.fromstring(line, dtype=np.int64, sep=' ') - 1 for line in lines if line.strip()]
+
+    tracked_ids = np.concatenate(tracks) if tracks else np.empty(0, dtype=np.int64)
+    unique_ids = np.unique(tracked_ids)
+    assert len(unique_ids) == len(tracked_ids), 'Found gallery samples shared between tracks'
+
+    rest_ids = np.setdiff1d(np.arange(gallery_size), unique_ids, assume_unique=True)
+    out_tracks = [track.tolist() for track in tracks] + [[i] for i in rest_ids.tolist()]
+
+    return out_tracks
+
+
+def find_matches(distance_matrix, tracks=None, top_k=100):
+    if tracks is None:
+        if top_k >= distance_matrix.shape[1]:
+            return np.argsort(distance_matrix, axis=-1)[:, :top_k]
+
+        # O(G) partition for the top-k candidates, then sort only those
+        candidate_ids = np.argpartition(distance_matrix, top_k, axis=-1)[:, :top_k]
+        candidate_distances = np.take_along_axis(distance_matrix, candidate_ids, axis=-1)
+        candidate_order = np.argsort(candidate_distances, axis=-1)
+
+        return np.take_along_axis(candidate_ids, candidate_order, axis=-1)
+
+    num_queries = distance_matrix.shape[0]
+    num_tracks = len(tracks)
+    track_lengths = np.array([len(track) for track in tracks])
+
+    tracks_padded = np.full((num_tracks, track_lengths.max()), -1, dtype=np.int64)
+    for track_id, track in enumerate(tracks):
+        tracks_padded[track_id, :len(track)] = track
+
+    # bucket tracks by length so the percentile runs on dense slices without masking
+    track_distances = np.empty((num_queries, num_tracks), dtype=distance_matrix.dtype)
+    for length in np.unique(track_lengths):
+        track_ids = np.where(track_lengths == length)[0]
+        distances = distance_matrix[:, tracks_padded[track_ids, :length]]
+        track_distances[:, track_ids] = np.percentile(distances, 10, axis=-1)
+
+    track_order = np.argsort(track_distances, axis=-1)
+
+    # expand ordered tracks to sample ids and drop the padding in one pass
+    candidates = tracks_padded[track_order].reshape(num_queries, -1)
+    valid_order = np.argsort(candidates < 0, axis=-1, kind='stable')[:, :top_k]
+    matches = np.take_along_axis(candidates, valid_order, axis=-1)
+
+    return matches.astype(np.int32)
+
+
+def dump_matches(matches, out_file):
+    shifted_matches = matches.reshape(matches.shape[0], -1) + 1
+
+    with open(out_file, 'w', buffering=1 << 20) as out_stream:
+        np.savetxt(out_stream, shifted_matches, fmt='%d', delimiter=' ')
+
+
+def main():
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--config-file', type=str, required=True,
+                        help='Path to config file')
+    parser.add_argument('--root', type=str, required=True,
+                        help='Path to content')
+    parser.add_argument('--tracks-file', type=str, default='',
+                        help='Path to file with tracks')
+    parser.add_argument('--out-file', type=str, required=True,
+                        help='Path to output file')
+    parser.add_argument('--num-data-workers', type=int, default=None,
+                        help='Number of DataLoader workers (default: CPU-core-derived)')
+    parser.add_argument('opts', default=None, nargs=argparse.REMAINDER,
+                        help='Modify config options using the command-line')
+    args = parser.parse_args()
+
+    cfg = get_default_config()
+    cfg.use_gpu = torch.cuda.is_available()
+    if args.config_file:
+        merge_from_files_with_base(cfg, args.config_file)
+    cfg.data.root = args.root
+    cfg.merge_from_list(args.opts)
+    cfg.freeze()
+
+    data_query, data_gallery, num_pids, gallery_size = build_datasets(cfg, args.num_data_workers)
+
+    print('Building model: {}'.format(cfg.model.name))
+    model = build_model(**model_kwargs(cfg, num_pids))
+    load_pretrained_weights(model, cfg.model.load_weights)
+    if cfg.use_gpu:
+        model = model.cuda()
+
+    print('Extracting query features ...')
+    embeddings_query = extract_features(model, data_query, cfg.use_gpu)
+    print('Extracting gallery features ...')
+    embeddings_gallery = extract_features(model, data_gallery, cfg.use_gpu)
+
+    print('Calculating distance matrices ...')
+    if cfg.test.rerank:
+        # one stacked GEMM instead of three: slice the qq/qg/gg blocks of [Q; G] @ [Q; G]^T
+        num_queries = embeddings_query.size(0)
+        stacked_embeddings = torch.cat((embeddings_query, embeddings_gallery), dim=0)
+        distances = calculate_distances(stacked_embeddings, stacked_embeddings)
+        distance_matrix_qq = distances[:num_queries, :num_queries]
+        distance_matrix_qg = distances[:num_queries, num_queries:]
+        distance_matrix_gg = distances[num_queries:, num_queries:]
+
+        print('Applying re-ranking ...')
+        if distances.is_cuda:
+            distance_matrix_qg = re_ranking_torch(distance_matrix_qg, distance_matrix_qq,
+                                                  distance_matrix_gg).cpu().numpy()
+        else:
+            distance_matrix_qg = re_ranking(distance_matrix_qg.cpu().numpy(),
+                                            distance_matrix_qq.cpu().numpy(),
+                                            distance_matrix_gg.cpu().numpy())
+    else:
+        distance_matrix_qg = calculate_distances(embeddings_query, embeddings_gallery).cpu().numpy()
+
+    tracks = None
+    if args.tracks_file:
+        print('Loading tracks ...')
+        tracks = load_tracks(args.tracks_file, gallery_size)
+
+    print('Finding matches ...')
+    matches = find_matches(distance_matrix_qg, tracks, top_k=100)
+
+    print('Dumping matches ...')
+    dump_matches(matches, args.out_file)
+
+
+if __name__ == '__main__':
+    main()
@@ -34,7 +34,8 @@ class DataManager(object):
         norm_mean=None,
         norm_std=None,
         use_gpu=False,
-        apply_masks_to_test=False
+        apply_masks_to_test=False,
+        uint8_pipeline=False
     ):
         self.source_groups = sources
         if self.source_groups is None:
@@ -53,13 +54,18 @@ class DataManager(object):
 
         self.height = height
         self.width = width
+        # resolved stats are kept so the engines can normalize on GPU when
+        # the uint8 pipeline is enabled
+        self.norm_mean = list(norm_mean) if norm_mean is not None else [0.485, 0.456, 0.406]
+        self.norm_std = list(norm_std) if norm_std is not None else [0.229, 0.224, 0.225]
         self.transform_tr, self.transform_te = build_transforms(
             self.height,
             self.width,
             transforms=transforms,
-            norm_mean=norm_mean,
-            norm_std=norm_std,
+            norm_mean=self.norm_mean,
+            norm_std=self.norm_std,
             apply_masks_to_test=apply_masks_to_test,
+            uint8_pipeline=uint8_pipeline,
         )
 
         self.use_gpu = (torch.cuda.is_available() and use_gpu)
@@ -190,7 +196,8 @@ class ImageDataManager(DataManager):
         apply_masks_to_test=False,
         min_samples_per_id=0,
         num_sampled_packages=1,
-        filter_classes=None
+        filter_classes=None,
+        uint8_pipeline=False
     ):
 
         super(ImageDataManager, self).__init__(
@@ -202,7 +209,8 @@ class ImageDataManager(DataManager):
             norm_mean=norm_mean,
             norm_std=norm_std,
             use_gpu=use_gpu,
-            apply_masks_to_test=apply_masks_to_test
+            apply_masks_to_test=apply_masks_to_test,
+            uint8_pipeline=uint8_pipeline
         )
 
         print('=> Loading train (source) dataset')
@@ -252,14 +260,34 @@ class ImageDataManager(DataManager):
             shuffle=False,
             worker_init_fn=worker_init_fn,
             num_workers=workers,
+            # pinning is required for the engines' non_blocking H2D copies to
+            # be truly asynchronous; batches are plain tuples of tensors, so
+            # the default pin path handles them without a custom pin_memory()
             pin_memory=self.use_gpu,
-            drop_last=True
+            drop_last=True,
+            # keep the worker pool (and its pinned staging buffers) alive
+            # across epochs instead of re-forking it every epoch
+            **(dict(persistent_workers=True, prefetch_factor=4) if workers > 0 else {})
         )
 
         print('=> Loading test (target) dataset')
         self.test_loader = {name: {'query': None, 'gallery': None} for name in self.targets}
         self.test_dataset = {name: {'query': None, 'gallery': None} for name in self.targets}
 
+        test_loader_kwargs = dict(
+            batch_size=batch_size_test,
+            shuffle=False,
+            num_workers=workers,
+            worker_init_fn=worker_init_fn,
+            pin_memory=self.use_gpu,
+            drop_last=False
+        )
+        if workers > 0:
+            # keep the worker pools alive between the query and gallery
+            # passes (and between eval epochs) instead of re-spawning them,
+            # and prefetch deeper so CPU decoding overlaps GPU compute
+            test_loader_kwargs.update(persistent_workers=True, prefetch_factor=4)
+
         for name in self.targets:
             if name == 'lfw':
                 lfw_data = init_image_dataset(
@@ -269,12 +297,7 @@ class ImageDataManager(DataManager):
                 )
                 self.test_loader[name]['pairs'] = torch.utils.data.DataLoader(
                     lfw_data,
-                    batch_size=batch_size_test,
-                    shuffle=False,
-                    num_workers=workers,
-                    pin_memory=self.use_gpu,
-                    worker_init_fn=worker_init_fn,
-                    drop_last=False
+                    **test_loader_kwargs
                 )
             else:
                 # build query loader
@@ -295,12 +318,7 @@ class ImageDataManager(DataManager):
                 )
                 self.test_loader[name]['query'] = torch.utils.data.DataLoader(
                     query_dataset,
-                    batch_size=batch_size_test,
-                    shuffle=False,
-                    num_workers=workers,
-                    worker_init_fn=worker_init_fn,
-                    pin_memory=self.use_gpu,
-                    drop_last=False
+                    **test_loader_kwargs
                 )
 
                 # build gallery loader
@@ -322,12 +340,7 @@ class ImageDataManager(DataManager):
                 )
                 self.test_loader[name]['gallery'] = torch.utils.data.DataLoader(
                     gallery_dataset,
-                    batch_size=batch_size_test,
-                    worker_init_fn=worker_init_fn,
-                    shuffle=False,
-                    num_workers=workers,
-                    pin_memory=self.use_gpu,
-                    drop_last=False
+                    **test_loader_kwargs
                 )
 
                 self.test_dataset[name]['query'] = query_dataset.query
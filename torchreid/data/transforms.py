@@ -937,6 +937,25 @@ class PairToTensor(object):
 
         return image, mask
 
+
+class PairToUint8Tensor(object):
+    """Converts a PIL image to a contiguous uint8 CHW tensor without scaling.
+
+    Pairs with the engines' on-GPU normalization: a uint8 batch moves 4x
+    fewer bytes over PCIe than a normalized float32 one.
+    """
+
+    def __call__(self, input_tuple):
+        image, mask = input_tuple
+
+        array = np.asarray(image, dtype=np.uint8)
+        if array.ndim == 2:
+            array = np.repeat(array[:, :, None], 3, axis=2)
+        image = torch.from_numpy(np.ascontiguousarray(array.transpose(2, 0, 1)))
+        mask = F.to_tensor(mask) if mask != '' else mask
+
+        return image, mask
+
 _AUGMIX_TRANSFORMS_GREY = [
             'SharpnessIncreasing',  # not in paper
             'ShearX',
@@ -1341,16 +1360,27 @@ def build_transforms(height, width, transforms=None, norm_mean=(0.485, 0.456, 0.
         print('+ crop_pad')
         transform_tr += [RandomCropPad((height, width), padding=int(0.125*height))]
 
-    print('+ to torch tensor of range [0, 1]')
-    transform_tr += [PairToTensor()]
-    print('+ normalization (mean={}, std={})'.format(norm_mean, norm_std))
-    transform_tr += [PairNormalize(mean=norm_mean, std=norm_std)]
-    if transforms.random_erase.enable and transforms.random_erase.norm_image:
-        print('+ random erase')
-        transform_tr += [RandomErasing(**transforms.random_erase)]
+    uint8_pipeline = kwargs.get('uint8_pipeline', False)
+    if uint8_pipeline and transforms.random_erase.enable and transforms.random_erase.norm_image:
+        # this flavor of random erase needs normalized float images on host
+        print('uint8 pipeline is incompatible with random erase on normalized images, falling back')
+        uint8_pipeline = False
+
+    if uint8_pipeline:
+        print('+ to uint8 torch tensor (normalization deferred to GPU)')
+        transform_tr += [PairToUint8Tensor()]
+    else:
+        print('+ to torch tensor of range [0, 1]')
+        transform_tr += [PairToTensor()]
+        print('+ normalization (mean={}, std={})'.format(norm_mean, norm_std))
+        transform_tr += [PairNormalize(mean=norm_mean, std=norm_std)]
+        if transforms.random_erase.enable and transforms.random_erase.norm_image:
+            print('+ random erase')
+            transform_tr += [RandomErasing(**transforms.random_erase)]
 
     transform_tr = Compose(transform_tr)
-    transform_te = build_test_transform(height, width, norm_mean, norm_std, apply_masks_to_test, transforms)
+    transform_te = build_test_transform(height, width, norm_mean, norm_std, apply_masks_to_test, transforms,
+                                        uint8_pipeline=uint8_pipeline)
     return transform_tr, transform_te
 
 
@@ -1375,10 +1405,14 @@ def build_test_transform(height, width, norm_mean=(0.485, 0.456, 0.406), norm_st
     if transforms is not None and transforms.force_gray_scale.enable:
         print('+ force_gray_scale')
         transform_te.append(ForceGrayscale())
-    print('+ to torch tensor of range [0, 1]')
-    transform_te.append(PairToTensor())
-    print('+ normalization (mean={}, std={})'.format(norm_mean, norm_std))
-    transform_te.append(PairNormalize(mean=norm_mean, std=norm_std))
+    if kwargs.get('uint8_pipeline', False):
+        print('+ to uint8 torch tensor (normalization deferred to GPU)')
+        transform_te.append(PairToUint8Tensor())
+    else:
+        print('+ to torch tensor of range [0, 1]')
+        transform_te.append(PairToTensor())
+        print('+ normalization (mean={}, std={})'.format(norm_mean, norm_std))
+        transform_te.append(PairNormalize(mean=norm_mean, std=norm_std))
     transform_te = Compose(transform_te)
 
     return transform_te
@@ -1,10 +1,14 @@
 from __future__ import absolute_import, division, print_function
 import datetime
+import hashlib
+import json
 import os
 import os.path as osp
 import time
 from collections import namedtuple, OrderedDict
 from copy import deepcopy
+from functools import partial
+from operator import itemgetter
 from torchreid.utils.tools import StateCacher, set_random_seed
 import optuna
 
@@ -15,12 +19,16 @@ from torch.nn import functional as F
 from torchreid.optim import ReduceLROnPlateauV2, WarmupScheduler
 from torchreid import metrics
 from torchreid.losses import DeepSupervision
-from torchreid.utils import (AverageMeter, MetricMeter, get_model_attr,
-                             open_all_layers, open_specified_layers,
-                             re_ranking, save_checkpoint,
-                             visualize_ranked_results, EMA)
+from torchreid.utils import (AverageMeter, CheckpointWriter, MetricMeter,
+                             get_model_attr, open_all_layers,
+                             open_specified_layers, re_ranking,
+                             re_ranking_torch, visualize_ranked_results, EMA)
 
 
+# torch.inference_mode appeared in 1.9; fall back to no_grad on the
+# torch==1.8.1 baseline from requirements.txt
+_inference_mode = getattr(torch, 'inference_mode', torch.no_grad)
+
 EpochIntervalToValue = namedtuple('EpochIntervalToValue', ['first', 'last', 'value_inside', 'value_outside'])
 
 def _get_cur_action_from_epoch_interval(epoch_interval, epoch):
@@ -35,6 +43,110 @@ def _get_cur_action_from_epoch_interval(epoch_interval, epoch):
 
     return epoch_interval.value_inside
 
+class CUDAPrefetcher:
+    """Wraps a DataLoader and uploads each batch on a side CUDA stream.
+
+    The copy of batch N is issued while batch N-1 is still being computed,
+    hiding the PCIe transfer. Consumers receive GPU-resident tensors, so
+    the ``.cuda(non_blocking=True)`` calls in ``parse_data_for_train``
+    become no-ops.
+    """
+
+    def __init__(self, loader):
+        self.loader = loader
+        self.stream = torch.cuda.Stream()
+
+    def __len__(self):
+        return len(self.loader)
+
+    def _move(self, batch):
+        if isinstance(batch, torch.Tensor):
+            return batch.cuda(non_blocking=True)
+        if isinstance(batch, (list, tuple)):
+            return type(batch)(self._move(item) for item in batch)
+        if isinstance(batch, dict):
+            return {k: self._move(v) for k, v in batch.items()}
+        return batch
+
+    @staticmethod
+    def _record(batch, stream):
+        # ties the side-stream allocations to the consumer stream so the
+        # caching allocator cannot hand their memory out too early
+        if isinstance(batch, torch.Tensor):
+            if batch.is_cuda:
+                batch.record_stream(stream)
+        elif isinstance(batch, (list, tuple)):
+            for item in batch:
+                CUDAPrefetcher._record(item, stream)
+        elif isinstance(batch, dict):
+            for item in batch.values():
+                CUDAPrefetcher._record(item, stream)
+
+    def __iter__(self):
+        it = iter(self.loader)
+        try:
+            next_batch = next(it)
+        except StopIteration:
+            return
+        with torch.cuda.stream(self.stream):
+            next_batch = self._move(next_batch)
+
+        while True:
+            current_stream = torch.cuda.current_stream()
+            current_stream.wait_stream(self.stream)
+            batch = next_batch
+            self._record(batch, current_stream)
+
+            done = False
+            try:
+                next_batch = next(it)
+            except StopIteration:
+                done = True
+            if not done:
+                with torch.cuda.stream(self.stream):
+                    next_batch = self._move(next_batch)
+
+            yield batch
+            if done:
+                return
+
+
+class _NormalizedModel(torch.nn.Module):
+    """Casts + normalizes uint8 image batches before delegating to a model.
+
+    The classification/LFW metric helpers consume loader batches directly,
+    so with ``data.uint8_pipeline`` they would otherwise feed raw uint8
+    pixels into float weights. Kept as an ``nn.Module`` because those
+    helpers dispatch on ``isinstance(model, torch.nn.Module)``.
+    """
+
+    def __init__(self, model, normalize):
+        super().__init__()
+        self.model = model
+        self._normalize = normalize
+
+    def forward(self, imgs, *args, **kwargs):
+        if imgs.dtype == torch.uint8:
+            imgs = self._normalize(imgs)
+        return self.model(imgs, *args, **kwargs)
+
+
+# shared sentinel for attribute-free records: callers get the same empty
+# container every batch instead of a fresh allocation
+_EMPTY_ATTR = tuple()
+
+_zeros_cache = {}
+
+def _cached_zeros_like(tensor):
+    # dataset_id=0 is a constant sentinel, so batches of the same shape can
+    # share one read-only zero tensor instead of allocating every iteration
+    key = (tensor.device, tensor.dtype, tensor.shape)
+    out = _zeros_cache.get(key)
+    if out is None:
+        out = torch.zeros(tensor.shape, dtype=tensor.dtype, device=tensor.device)
+        _zeros_cache[key] = out
+    return out
+
 def get_initial_lr_from_checkpoint(filename):
     if not filename:
         return None
@@ -62,12 +174,23 @@ class Engine:
                  epoch_interval_for_turn_off_mutual_learning=None,
                  use_ema_decay=False,
                  ema_decay=0.999,
+                 use_amp=False,
+                 bucket_cap_mb=None,
+                 channels_last=False,
                  seed=5):
 
         self.datamanager = datamanager
         self.train_loader = self.datamanager.train_loader
         self.test_loader = self.datamanager.test_loader
         self.use_gpu = (torch.cuda.is_available() and use_gpu)
+        self.is_distributed = torch.distributed.is_available() and torch.distributed.is_initialized()
+        self.rank = torch.distributed.get_rank() if self.is_distributed else 0
+        self.local_rank = int(os.environ.get('LOCAL_RANK', 0))
+        self.is_main_process = self.rank == 0
+        self.bucket_cap_mb = bucket_cap_mb
+        self.channels_last = channels_last and self.use_gpu
+        self.use_amp = use_amp and self.use_gpu
+        self.scaler = torch.cuda.amp.GradScaler(enabled=self.use_amp)
         self.save_chkpt = save_chkpt
         self.writer = None
         self.use_ema_decay = use_ema_decay
@@ -90,13 +213,26 @@ class Engine:
 
         print(f'Engine: should_freeze_aux_models={should_freeze_aux_models}')
         self.should_freeze_aux_models = should_freeze_aux_models
-        self.nncf_metainfo = deepcopy(nncf_metainfo)
+        # json round-trip: metainfo is checkpoint-bound (hence JSON-serializable)
+        # and this is much cheaper than deepcopy for plain dicts
+        self.nncf_metainfo = json.loads(json.dumps(nncf_metainfo)) if nncf_metainfo else None
         self.initial_lr = initial_lr
         self.epoch_interval_for_aux_model_freeze = epoch_interval_for_aux_model_freeze
         self.epoch_interval_for_turn_off_mutual_learning = epoch_interval_for_turn_off_mutual_learning
         self.model_names_to_freeze = []
+        self._aux_params_cache = {}
+        self._turn_off_mutual_learning_cache = (None, None)
         self.ema_wrapped_models = []
         self.current_lr = None
+        self.checkpoint_writer = CheckpointWriter()
+        self._train_prefetcher = None
+        self._last_freeze_state = None
+        self._orig_param_groups = {}
+        self._img_mean = None
+        self._img_std = None
+        # per-batch flag plumbing resolved once at construction; engines
+        # that need the dict form rebuild this with their own flags
+        self._parse_train = self._build_parse_train()
 
         if isinstance(models, (tuple, list)):
             assert isinstance(optimizers, (tuple, list))
@@ -125,6 +261,10 @@ class Engine:
             self.register_model('model', models, optimizers, schedulers)
         self.main_model_name = self.get_model_names()[0]
         self.model_device = next(self.models[self.main_model_name].parameters()).device
+        if self.model_device.type == 'cuda':
+            # bake the normalization constants on the device up front so the
+            # first uint8 batch does not pay a synchronous H2D transfer
+            self._init_norm_constants(self.model_device)
         self.lb_lr = initial_lr / lr_decay_factor
 
     def _should_freeze_aux_models(self, epoch):
@@ -134,15 +274,22 @@ class Engine:
             # simple case
             return True
         res = _get_cur_action_from_epoch_interval(self.epoch_interval_for_aux_model_freeze, epoch)
-        print(f'_should_freeze_aux_models: return res={res}')
+        if self.is_main_process:
+            print(f'_should_freeze_aux_models: return res={res}')
         return res
 
     def _should_turn_off_mutual_learning(self, epoch):
         if self.epoch_interval_for_turn_off_mutual_learning is None:
             # simple case
             return False
+        # memoized per epoch: subclasses query this every batch
+        cached_epoch, cached_res = self._turn_off_mutual_learning_cache
+        if cached_epoch == epoch:
+            return cached_res
         res = _get_cur_action_from_epoch_interval(self.epoch_interval_for_turn_off_mutual_learning, epoch)
-        print(f'_should_turn_off_mutual_learning: return {res}')
+        if self.is_main_process:
+            print(f'_should_turn_off_mutual_learning: return {res}')
+        self._turn_off_mutual_learning_cache = (epoch, res)
         return res
 
     def register_model(self, name='model', model=None, optim=None, sched=None):
@@ -161,6 +308,30 @@ class Engine:
                 'Cannot assign sched before super().__init__() call'
             )
 
+        if model is not None and self.channels_last:
+            # NHWC weights pair with the NHWC input cast in the train loop
+            # to select cuDNN's Tensor Core kernels
+            model = model.to(memory_format=torch.channels_last)
+
+        if model is not None and self.use_gpu and self.is_distributed \
+                and not isinstance(model, torch.nn.parallel.DistributedDataParallel):
+            ddp_kwargs = dict(
+                device_ids=[self.local_rank],
+                output_device=self.local_rank,
+                gradient_as_bucket_view=True,
+                # each rank sees statistically similar reid data, so the
+                # per-forward BN running-stat broadcast is redundant NCCL
+                # latency; the nets also have no conditional branches, so
+                # the unused-parameter search can be skipped too
+                broadcast_buffers=False,
+                find_unused_parameters=False
+            )
+            if self.bucket_cap_mb is not None:
+                # larger buckets fit more layers of big reid backbones per allreduce
+                ddp_kwargs['bucket_cap_mb'] = self.bucket_cap_mb
+            model = torch.nn.parallel.DistributedDataParallel(
+                model.cuda(self.local_rank), **ddp_kwargs)
+
         self.models[name] = model
         self.optims[name] = optim
         self.scheds[name] = sched
@@ -176,37 +347,57 @@ class Engine:
         else:
             return names_real
 
+    @staticmethod
+    def _snapshot_state(obj):
+        # detached CPU copy of a (possibly GPU) state dict; a plain
+        # deepcopy would duplicate CUDA tensors in VRAM first
+        if isinstance(obj, torch.Tensor):
+            return obj.detach().cpu()
+        if isinstance(obj, dict):
+            return {k: Engine._snapshot_state(v) for k, v in obj.items()}
+        if isinstance(obj, list):
+            return [Engine._snapshot_state(v) for v in obj]
+        if isinstance(obj, tuple):
+            return tuple(Engine._snapshot_state(v) for v in obj)
+        return deepcopy(obj)
+
     def save_model(self, epoch, save_dir, is_best=False):
-        def create_sym_link(path,name):
-            if osp.lexists(name):
-                os.remove(name)
-            os.symlink(path, name)
+        if not self.is_main_process:
+            # under DDP every rank holds identical weights, so only rank 0 writes
+            return
 
         names = self.get_model_names()
 
         for name in names:
-            ckpt_path = save_checkpoint(
-                            {
-                                'state_dict': self.models[name].state_dict(),
-                                'epoch': epoch + 1,
-                                'optimizer': self.optims[name].state_dict(),
-                                'scheduler': self.scheds[name].state_dict(),
-                                'num_classes': self.datamanager.num_train_pids,
-                                'classes_map': self.datamanager.train_loader.dataset.classes,
-                                'nncf_metainfo': self.nncf_metainfo,
-                                'initial_lr': self.initial_lr
-                            },
-                            osp.join(save_dir, name),
-                            is_best=is_best,
-                            name=name
-                        )
+            # snapshot the state on the main thread so the background
+            # write sees consistent tensors while training continues
+            state_dict = OrderedDict(
+                (k, v.detach().cpu() if isinstance(v, torch.Tensor) else deepcopy(v))
+                for k, v in self.models[name].state_dict().items()
+            )
 
+            sym_links = []
             if name == self.main_model_name:
-                latest_name = osp.join(save_dir, 'latest.pth')
-                create_sym_link(ckpt_path, latest_name)
+                sym_links.append(osp.join(save_dir, 'latest.pth'))
                 if is_best:
-                    best_model = osp.join(save_dir, 'best.pth')
-                    create_sym_link(ckpt_path, best_model)
+                    sym_links.append(osp.join(save_dir, 'best.pth'))
+
+            self.checkpoint_writer.enqueue(
+                {
+                    'state_dict': state_dict,
+                    'epoch': epoch + 1,
+                    'optimizer': self._snapshot_state(self.optims[name].state_dict()),
+                    'scheduler': self._snapshot_state(self.scheds[name].state_dict()),
+                    'num_classes': self.datamanager.num_train_pids,
+                    'classes_map': self.datamanager.train_loader.dataset.classes,
+                    'nncf_metainfo': self.nncf_metainfo,
+                    'initial_lr': self.initial_lr
+                },
+                osp.join(save_dir, name),
+                is_best=is_best,
+                name=name,
+                sym_links=sym_links
+            )
 
     def set_model_mode(self, mode='train', names=None):
         assert mode in ['train', 'eval', 'test']
@@ -219,8 +410,11 @@ class Engine:
                 self.models[name].eval()
 
     def get_current_lr(self, names=None):
-        names = self.get_model_names(names)
-        name = names[0]
+        if names is None:
+            # hot path: called every batch from train()
+            name = self.main_model_name
+        else:
+            name = self.get_model_names(names)[0]
         return self.optims[name].param_groups[0]['lr']
 
     def update_lr(self, names=None, output_avg_metric=None):
@@ -293,6 +487,7 @@ class Engine:
         perf_monitor=None,
         stop_callback=None,
         initial_seed=5,
+        skip_initial_test=False,
         **kwargs
     ):
         r"""A unified pipeline for training and evaluating a model.
@@ -324,6 +519,10 @@ class Engine:
             ranks (list, optional): cmc ranks to be computed. Default is [1, 5, 10, 20].
             rerank (bool, optional): uses person re-ranking (by Zhong et al. CVPR'17).
                 Default is False. This is only enabled when test_only=True.
+            skip_initial_test (bool, optional): if True, reuses the cached
+                "Test before training" results from ``save_dir/.initial_eval.json``
+                when the model weights have not changed since the previous launch.
+                Default is False.
         """
         if visrank and not test_only:
             raise ValueError('visrank can be set to True only if test_only=True')
@@ -343,18 +542,26 @@ class Engine:
             return test_results
 
         if not lr_finder:
-            print('Test before training')
-            self.test(
-                      0,
-                      dist_metric=dist_metric,
-                      normalize_feature=normalize_feature,
-                      visrank=visrank,
-                      visrank_topk=visrank_topk,
-                      save_dir=save_dir,
-                      use_metric_cuhk03=use_metric_cuhk03,
-                      ranks=ranks,
-                      rerank=rerank,
-            )
+            initial_test_cache = osp.join(save_dir, '.initial_eval.json')
+            cached_metrics = None
+            if skip_initial_test:
+                cached_metrics = self._load_initial_test_cache(initial_test_cache)
+            if cached_metrics is not None:
+                print('Test before training: reusing cached results from "{}"'.format(initial_test_cache))
+            else:
+                print('Test before training')
+                initial_metrics = self.test(
+                          0,
+                          dist_metric=dist_metric,
+                          normalize_feature=normalize_feature,
+                          visrank=visrank,
+                          visrank_topk=visrank_topk,
+                          save_dir=save_dir,
+                          use_metric_cuhk03=use_metric_cuhk03,
+                          ranks=ranks,
+                          rerank=rerank,
+                )
+                self._store_initial_test_cache(initial_test_cache, initial_metrics)
         else:
             self.configure_lr_finder(trial, lr_finder)
             self.backup_model()
@@ -425,6 +632,8 @@ class Engine:
 
         if perf_monitor and not lr_finder: perf_monitor.on_train_end()
         if lr_finder and lr_finder.mode != 'fast_ai': self.restore_model()
+        # make sure all queued checkpoints hit the disk before reporting
+        self.checkpoint_writer.join()
         elapsed = round(time.time() - time_start)
         elapsed = str(datetime.timedelta(seconds=elapsed))
         print('Elapsed {}'.format(elapsed))
@@ -434,17 +643,32 @@ class Engine:
 
         return top1
 
+    def _get_aux_model_params(self, model_name):
+        # walking model.parameters() every epoch is thousands of Python
+        # attribute reads, so the (stable) parameter list is cached
+        params = self._aux_params_cache.get(model_name)
+        if params is None:
+            params = [p for p in self.models[model_name].parameters()
+                      if p.dtype.is_floating_point]
+            self._aux_params_cache[model_name] = params
+        return params
+
     def _freeze_aux_models(self):
         for model_name in self.model_names_to_freeze:
-            model = self.models[model_name]
-            model.eval()
-            open_specified_layers(model, [])
+            self.models[model_name].eval()
+            for p in self._get_aux_model_params(model_name):
+                p.requires_grad_(False)
+        if self.model_names_to_freeze:
+            # aux toggling invalidates the cached transfer-learning state
+            self._last_freeze_state = None
 
     def _unfreeze_aux_models(self):
         for model_name in self.model_names_to_freeze:
-            model = self.models[model_name]
-            model.train()
-            open_all_layers(model)
+            self.models[model_name].train()
+            for p in self._get_aux_model_params(model_name):
+                p.requires_grad_(True)
+        if self.model_names_to_freeze:
+            self._last_freeze_state = None
 
     def configure_lr_finder(self, trial, finder_cfg):
         if trial is None:
@@ -475,6 +699,38 @@ class Engine:
         get_model_attr(self.models[self.main_model_name],'to')(self.model_device)
         set_random_seed(self.seed)
 
+    def _model_weights_fingerprint(self):
+        # the first kernel of the main model carries enough entropy to
+        # detect weight changes without hashing the whole state dict
+        param = next(get_model_attr(self.models[self.main_model_name], 'parameters')())
+        return hashlib.sha1(param.detach().cpu().numpy().tobytes()[:4096]).hexdigest()
+
+    def _load_initial_test_cache(self, cache_path):
+        if not osp.isfile(cache_path):
+            return None
+        try:
+            with open(cache_path) as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if cached.get('fingerprint') != self._model_weights_fingerprint():
+            return None
+        return cached.get('metrics')
+
+    def _store_initial_test_cache(self, cache_path, metrics_):
+        if not self.is_main_process:
+            return
+        # test() returns numpy float32 scalars, which json cannot serialize
+        metrics_ = [float(m) if m is not None else None for m in metrics_]
+        try:
+            os.makedirs(osp.dirname(cache_path), exist_ok=True)
+            with open(cache_path, 'w') as f:
+                json.dump({'fingerprint': self._model_weights_fingerprint(),
+                           'metrics': metrics_}, f)
+        except (OSError, TypeError, ValueError):
+            # the cache is a pure optimization, never fail the run over it
+            pass
+
     def train(self, print_freq=10, fixbase_epoch=0, open_layers=None, lr_finder=False, perf_monitor=None,
               stop_callback=None):
         losses = MetricMeter()
@@ -484,7 +740,11 @@ class Engine:
 
         self.set_model_mode('train')
 
-        if not self._should_freeze_aux_models(self.epoch):
+        if self.is_distributed and hasattr(getattr(self.train_loader, 'sampler', None), 'set_epoch'):
+            self.train_loader.sampler.set_epoch(self.epoch)
+
+        should_freeze = self._should_freeze_aux_models(self.epoch)
+        if not should_freeze:
             # NB: it should be done before `two_stepped_transfer_learning`
             # to give possibility to freeze some layers in the unlikely event
             # that `two_stepped_transfer_learning` is used together with nncf
@@ -494,27 +754,60 @@ class Engine:
             self.epoch, fixbase_epoch, open_layers
         )
 
-        if self._should_freeze_aux_models(self.epoch):
+        if should_freeze:
             self._freeze_aux_models()
 
         self.num_batches = len(self.train_loader)
-        end = time.time()
-        for self.batch_idx, data in enumerate(self.train_loader):
+        # hoist loop-invariant attribute reads; the loop body is short
+        # relative to batch time, so the LOAD_ATTRs add up
+        num_batches = self.num_batches
+        max_epoch = self.max_epoch
+        epoch = self.epoch
+        writer = self.writer
+        main_param_groups = self.optims[self.main_model_name].param_groups
+        if self.use_gpu:
+            if self._train_prefetcher is None:
+                self._train_prefetcher = CUDAPrefetcher(self.train_loader)
+            train_iter = self._train_prefetcher
+        else:
+            train_iter = self.train_loader
+        end = time.monotonic()
+        for batch_idx, data in enumerate(train_iter):
+            self.batch_idx = batch_idx
             if perf_monitor and not lr_finder: perf_monitor.on_train_batch_begin()
 
-            data_time.update(time.time() - end)
+            data_ready = time.monotonic()
+            data_time.update(data_ready - end)
+
+            if torch.is_tensor(data[0]) and data[0].dtype == torch.uint8:
+                # uint8 pipeline: pixels crossed PCIe as raw bytes and get
+                # cast + normalized here on the compute device
+                data = [self._normalize_on_device(data[0])] + list(data[1:])
+            if self.channels_last and torch.is_tensor(data[0]) and data[0].dim() == 4:
+                # NHWC inputs + NHWC weights (see register_model) keep the
+                # convs on Tensor Core layouts; 5-D package batches are
+                # reshaped by the engines and skip the conversion
+                data = [data[0].contiguous(memory_format=torch.channels_last)] + list(data[1:])
 
             loss_summary, avg_acc = self.forward_backward(data)
-            batch_time.update(time.time() - end)
+            # drop the batch reference as soon as the step consumed it so
+            # the loader can recycle its (pinned) buffers while the logging
+            # and scheduler work below runs
+            del data
+            now = time.monotonic()
+            batch_time.update(now - end)
+            end = now
 
             losses.update(loss_summary)
             accuracy.update(avg_acc)
+            # read the lr once per batch and reuse it below
+            current_lr = main_param_groups[0]['lr']
             if perf_monitor and not lr_finder: perf_monitor.on_train_batch_end()
 
-            if not lr_finder and (((self.batch_idx + 1) % print_freq) == 0 or
-                                        self.batch_idx == self.num_batches - 1):
-                nb_this_epoch = self.num_batches - (self.batch_idx + 1)
-                nb_future_epochs = (self.max_epoch - (self.epoch + 1)) * self.num_batches
+            if not lr_finder and (((batch_idx + 1) % print_freq) == 0 or
+                                        batch_idx == num_batches - 1):
+                nb_this_epoch = num_batches - (batch_idx + 1)
+                nb_future_epochs = (max_epoch - (epoch + 1)) * num_batches
                 eta_seconds = batch_time.avg * (nb_this_epoch+nb_future_epochs)
                 eta_str = str(datetime.timedelta(seconds=int(eta_seconds)))
                 print(
@@ -525,30 +818,31 @@ class Engine:
                     'eta {eta}\t'
                     '{losses}\t'
                     'lr {lr:.6f}'.format(
-                        self.epoch + 1,
-                        self.max_epoch,
-                        self.batch_idx + 1,
-                        self.num_batches,
+                        epoch + 1,
+                        max_epoch,
+                        batch_idx + 1,
+                        num_batches,
                         batch_time=batch_time,
                         data_time=data_time,
                         accuracy=accuracy,
                         eta=eta_str,
                         losses=losses,
-                        lr=self.get_current_lr()
+                        lr=current_lr
                     )
                 )
 
-            if self.writer is not None and not lr_finder:
-                n_iter = self.epoch * self.num_batches + self.batch_idx
-                self.writer.add_scalar('Train/time', batch_time.avg, n_iter)
-                self.writer.add_scalar('Train/data', data_time.avg, n_iter)
-                self.writer.add_scalar('Aux/lr', self.get_current_lr(), n_iter)
-                self.writer.add_scalar('Accuracy/train', accuracy.avg, n_iter)
+            if (writer is not None and not lr_finder and self.is_main_process
+                    and (((batch_idx + 1) % print_freq) == 0
+                         or batch_idx == num_batches - 1)):
+                n_iter = epoch * num_batches + batch_idx
+                writer.add_scalar('Train/time', batch_time.avg, n_iter)
+                writer.add_scalar('Train/data', data_time.avg, n_iter)
+                writer.add_scalar('Aux/lr', current_lr, n_iter)
+                writer.add_scalar('Accuracy/train', accuracy.avg, n_iter)
                 for name, meter in losses.meters.items():
-                    self.writer.add_scalar('Loss/' + name, meter.avg, n_iter)
+                    writer.add_scalar('Loss/' + name, meter.avg, n_iter)
 
-            end = time.time()
-            self.current_lr = self.get_current_lr()
+            self.current_lr = current_lr
             if stop_callback and stop_callback.check_stop():
                 break
 
@@ -646,7 +940,7 @@ class Engine:
                     mAP = cur_mAP
         return top1, top5, mAP
 
-    @torch.no_grad()
+    @_inference_mode()
     def _evaluate_classification(self, model, epoch, data_loader, model_name, dataset_name, ranks, lr_finder):
         labelmap = []
 
@@ -656,7 +950,8 @@ class Engine:
             for class_name in sorted(data_loader.dataset.classes.keys()):
                 labelmap.append(data_loader.dataset.classes[class_name])
 
-        cmc, mAP, norm_cm = metrics.evaluate_classification(data_loader, model, self.use_gpu, ranks, labelmap)
+        cmc, mAP, norm_cm = metrics.evaluate_classification(
+            data_loader, _NormalizedModel(model, self._normalize_on_device), self.use_gpu, ranks, labelmap)
 
         if self.writer is not None and not lr_finder:
             self.writer.add_scalar('Val/{}/{}/mAP'.format(dataset_name, model_name), mAP, epoch + 1)
@@ -673,10 +968,10 @@ class Engine:
 
         return cmc[0], cmc[1], mAP
 
-    @torch.no_grad()
+    @_inference_mode()
     def _evaluate_pairwise(self, model, epoch, data_loader, model_name):
         same_acc, diff_acc, overall_acc, auc, avg_optimal_thresh = metrics.evaluate_lfw(
-            data_loader, model, verbose=False
+            data_loader, _NormalizedModel(model, self._normalize_on_device), verbose=False
         )
 
         if self.writer is not None:
@@ -691,7 +986,7 @@ class Engine:
         print('Accuracy on negative pairs: {:.2%}'.format(diff_acc))
         print('Average threshold: {:.2}'.format(avg_optimal_thresh))
 
-    @torch.no_grad()
+    @_inference_mode()
     def _evaluate_reid(
         self,
         model,
@@ -711,20 +1006,33 @@ class Engine:
         lr_finder = False
     ):
         def _feature_extraction(data_loader):
-            f_, pids_, camids_ = [], [], []
+            f_, pids_, camids_ = None, [], []
+            offset = 0
             for _, data in enumerate(data_loader):
                 imgs, pids, camids = self.parse_data_for_eval(data)
                 if self.use_gpu:
-                    imgs = imgs.cuda()
-
-                features = model(imgs),
-                features = features.data.cpu()
-
-                f_.append(features)
+                    imgs = imgs.cuda(non_blocking=True)
+                if imgs.dtype == torch.uint8:
+                    imgs = self._normalize_on_device(imgs)
+                if self.channels_last and imgs.dim() == 4:
+                    imgs = imgs.contiguous(memory_format=torch.channels_last)
+
+                with torch.cuda.amp.autocast(enabled=self.use_amp):
+                    features = model(imgs)
+                # keep features on GPU so that normalization and the
+                # distance GEMM below run there as well
+                features = features.data.float()
+
+                if f_ is None:
+                    # allocate the output once instead of list-append +
+                    # torch.cat; D is known after the first forward
+                    f_ = features.new_empty((len(data_loader.dataset), features.size(1)))
+                f_[offset:offset + features.size(0)].copy_(features, non_blocking=True)
+                offset += features.size(0)
                 pids_.extend(pids)
                 camids_.extend(camids)
 
-            f_ = torch.cat(f_, 0)
+            f_ = f_[:offset]
             pids_ = np.asarray(pids_)
             camids_ = np.asarray(camids_)
 
@@ -738,12 +1046,16 @@ class Engine:
             gf = F.normalize(gf, p=2, dim=1)
 
         distmat = metrics.compute_distance_matrix(qf, gf, dist_metric)
-        distmat = distmat.numpy()
 
         if rerank:
             distmat_qq = metrics.compute_distance_matrix(qf, qf, dist_metric)
             distmat_gg = metrics.compute_distance_matrix(gf, gf, dist_metric)
-            distmat = re_ranking(distmat, distmat_qq, distmat_gg)
+            if distmat.is_cuda:
+                distmat = re_ranking_torch(distmat, distmat_qq, distmat_gg).cpu().numpy()
+            else:
+                distmat = re_ranking(distmat.numpy(), distmat_qq.numpy(), distmat_gg.numpy())
+        else:
+            distmat = distmat.cpu().numpy()
 
         cmc, mAP = metrics.evaluate_rank(
             distmat,
@@ -780,34 +1092,138 @@ class Engine:
 
     @staticmethod
     def compute_loss(criterion, outputs, targets, **kwargs):
-        if isinstance(outputs, (tuple, list)):
-            loss = DeepSupervision(criterion, outputs, targets, **kwargs)
-        else:
-            loss = criterion(outputs, targets, **kwargs)
-        return loss
+        # the output structure is fixed for the life of a model, so the
+        # tuple/list dispatch is resolved once and cached on the criterion
+        loss_fn = getattr(criterion, '_compute_loss_fn', None)
+        if loss_fn is None:
+            if isinstance(outputs, (tuple, list)):
+                loss_fn = partial(DeepSupervision, criterion)
+            else:
+                loss_fn = criterion
+            criterion._compute_loss_fn = loss_fn
+        return loss_fn(outputs, targets, **kwargs)
+
+    def _step_optimizer(self, optim):
+        # frozen (aux) models have no grads at all after zero_grad with
+        # set_to_none, and GradScaler.step asserts when an optimizer
+        # recorded no inf checks, so skip grad-less optimizers outright
+        has_grads = any(p.grad is not None
+                        for group in optim.param_groups for p in group['params'])
+        if has_grads:
+            self.scaler.step(optim)
+
+    def _init_norm_constants(self, device):
+        # constants are folded with the 1/255 scaling; under AMP they are
+        # kept in fp16 so normalization does not upcast the batch
+        mean = getattr(self.datamanager, 'norm_mean', None) or [0.485, 0.456, 0.406]
+        std = getattr(self.datamanager, 'norm_std', None) or [0.229, 0.224, 0.225]
+        dtype = torch.half if self.use_amp else torch.float
+        self._img_mean = torch.tensor(mean, dtype=dtype, device=device).view(1, 3, 1, 1).mul_(255.0)
+        self._img_std = torch.tensor(std, dtype=dtype, device=device).view(1, 3, 1, 1).mul_(255.0)
+
+    def _normalize_on_device(self, imgs):
+        """Casts a uint8 image batch to float and applies mean/std in place.
+
+        Counterpart of ``data.uint8_pipeline``: the loader ships raw uint8
+        pixels and the normalization constants live on the compute device,
+        baked once at engine construction.
+        """
+        if self._img_mean is None or self._img_mean.device != imgs.device:
+            self._init_norm_constants(imgs.device)
+        return imgs.to(self._img_mean.dtype).sub_(self._img_mean).div_(self._img_std)
+
+    def _build_parse_train(self, output_dict=False, enable_masks=False):
+        """Specializes ``parse_data_for_train`` for this engine's fixed flags.
+
+        ``output_dict``, ``enable_masks`` and ``use_gpu`` never change during
+        a run, so they are baked in here and the training loop calls the
+        returned parser with the batch alone.
+        """
+        if not output_dict:
+            if self.use_gpu:
+                def _parse(data):
+                    return data[0].cuda(non_blocking=True), data[1].cuda(non_blocking=True)
+                return _parse
+            return itemgetter(0, 1)
+
+        def _parse_dict_first(data):
+            # the record layout is fixed for the whole run, so inspect it
+            # on the first batch and install a parser with the layout
+            # (dataset_ids/masks/attributes present or not) baked in
+            parser = self._make_dict_parser(len(data) > 3, len(data) > 5, enable_masks)
+            self._parse_train = parser
+            return parser(data)
+
+        return _parse_dict_first
+
+    def _make_dict_parser(self, has_extras, has_attr, enable_masks):
+        use_gpu = self.use_gpu
+        to_gpu = Engine._to_gpu
+
+        if not has_extras:
+            def _parse(data):
+                obj_ids = to_gpu(data[1], use_gpu)
+                return dict(img=to_gpu(data[0], use_gpu), obj_id=obj_ids,
+                            dataset_id=_cached_zeros_like(obj_ids), mask=None, attr=None)
+            return _parse
+
+        if has_attr:
+            def _parse(data):
+                imgs = to_gpu(data[0], use_gpu)
+                obj_ids = to_gpu(data[1], use_gpu)
+                dataset_ids = to_gpu(data[3], use_gpu)
+                masks = to_gpu(data[4], use_gpu) if enable_masks else None
+                attr = list(data[5:])
+                if use_gpu:
+                    first = attr[0]
+                    if all(r.dtype == first.dtype and r.shape == first.shape for r in attr[1:]):
+                        # coalesce the per-head copies into one H2D transfer
+                        attr = list(torch.stack(attr).cuda(non_blocking=True).unbind(0))
+                    else:
+                        attr = [record.cuda(non_blocking=True) for record in attr]
+                return dict(img=imgs, obj_id=obj_ids, dataset_id=dataset_ids, mask=masks, attr=attr)
+            return _parse
+
+        def _parse(data):
+            obj_ids = to_gpu(data[1], use_gpu)
+            masks = to_gpu(data[4], use_gpu) if enable_masks else None
+            return dict(img=to_gpu(data[0], use_gpu), obj_id=obj_ids,
+                        dataset_id=to_gpu(data[3], use_gpu), mask=masks, attr=None)
+        return _parse
+
+    @staticmethod
+    def _to_gpu(tensor, use_gpu):
+        # async copy: the loaders pin their batches, so the transfer
+        # overlaps compute instead of blocking the host thread
+        return tensor.cuda(non_blocking=True) if use_gpu else tensor
 
     @staticmethod
     def parse_data_for_train(data, output_dict=False, enable_masks=False, use_gpu=False):
-        imgs = data[0]
+        to_gpu = Engine._to_gpu
 
-        obj_ids = data[1]
-        if use_gpu:
-            imgs = imgs.cuda()
-            obj_ids = obj_ids.cuda()
+        imgs = to_gpu(data[0], use_gpu)
+        obj_ids = to_gpu(data[1], use_gpu)
 
         if output_dict:
             if len(data) > 3:
-                dataset_ids = data[3].cuda() if use_gpu else data[3]
+                dataset_ids = to_gpu(data[3], use_gpu)
 
                 masks = None
                 if enable_masks:
-                    masks = data[4].cuda() if use_gpu else data[4]
+                    masks = to_gpu(data[4], use_gpu)
 
-                attr = [record.cuda() if use_gpu else record for record in data[5:]]
+                attr = list(data[5:])
                 if len(attr) == 0:
                     attr = None
+                elif use_gpu:
+                    first = attr[0]
+                    if all(r.dtype == first.dtype and r.shape == first.shape for r in attr[1:]):
+                        # coalesce the per-head copies into one H2D transfer
+                        attr = list(torch.stack(attr).cuda(non_blocking=True).unbind(0))
+                    else:
+                        attr = [record.cuda(non_blocking=True) for record in attr]
             else:
-                dataset_ids = torch.zeros_like(obj_ids)
+                dataset_ids = _cached_zeros_like(obj_ids)
                 masks = None
                 attr = None
 
@@ -816,12 +1232,42 @@ class Engine:
             return imgs, obj_ids
 
     @staticmethod
-    def parse_data_for_eval(data):
-        imgs = data[0]
-        obj_ids = data[1]
-        cam_ids = data[2]
+    def parse_data_for_train_tuple(data, enable_masks=False, use_gpu=False):
+        """Flat-tuple variant of ``parse_data_for_train``.
+
+        Returns ``(imgs, obj_ids, dataset_ids, masks, attr)`` without the
+        per-batch dict allocation, which keeps the data path transparent to
+        ``torch.compile``/``torch.jit.script`` wrappers. ``attr`` is a tuple
+        (the shared empty one when the records carry no attributes) rather
+        than ``None``.
+        """
+        to_gpu = Engine._to_gpu
 
-        return imgs, obj_ids, cam_ids
+        imgs = to_gpu(data[0], use_gpu)
+        obj_ids = to_gpu(data[1], use_gpu)
+
+        if len(data) <= 3:
+            return imgs, obj_ids, _cached_zeros_like(obj_ids), None, _EMPTY_ATTR
+
+        dataset_ids = to_gpu(data[3], use_gpu)
+        masks = to_gpu(data[4], use_gpu) if enable_masks else None
+
+        attr = tuple(data[5:])
+        if not attr:
+            attr = _EMPTY_ATTR
+        elif use_gpu:
+            first = attr[0]
+            if all(r.dtype == first.dtype and r.shape == first.shape for r in attr[1:]):
+                # coalesce the per-head copies into one H2D transfer
+                attr = torch.stack(attr).cuda(non_blocking=True).unbind(0)
+            else:
+                attr = tuple(record.cuda(non_blocking=True) for record in attr)
+
+        return imgs, obj_ids, dataset_ids, masks, attr
+
+    # (imgs, obj_ids, cam_ids); itemgetter does the split in C, which
+    # matters on the eval hot path where this runs once per batch
+    parse_data_for_eval = staticmethod(itemgetter(0, 1, 2))
 
     def two_stepped_transfer_learning(self, epoch, fixbase_epoch, open_layers):
         """Two-stepped transfer learning.
@@ -832,11 +1278,54 @@ class Engine:
         Reference: https://arxiv.org/abs/1611.05244
         """
 
-        if (epoch + 1) <= fixbase_epoch and open_layers is not None:
+        frozen = (epoch + 1) <= fixbase_epoch and open_layers is not None
+
+        if frozen:
             print('* Only train {} (epoch: {}/{})'.format(open_layers, epoch + 1, fixbase_epoch))
 
+        # the freeze state only flips at the fixbase boundary, so skip the
+        # per-parameter walk on epochs where nothing changes
+        if frozen == self._last_freeze_state:
+            return
+
+        if frozen:
             for model in self.models.values():
                 open_specified_layers(model, open_layers, strict=False)
         else:
             for model in self.models.values():
                 open_all_layers(model)
+        self._sync_optims_with_frozen_params(frozen)
+        self._last_freeze_state = frozen
+
+    def _sync_optims_with_frozen_params(self, frozen):
+        """Drops frozen parameters from the optimizers during the fixbase phase.
+
+        Setting requires_grad=False alone leaves the optimizers iterating
+        (and keeping moment state for) every frozen parameter; filtering
+        them out makes step()/zero_grad() proportional to the trainable
+        subset and releases the state memory.
+        """
+        for name in self.get_model_names():
+            optim = self.optims[name]
+            if optim is None:
+                continue
+            if frozen:
+                # drop .grad tensors while the groups still cover every
+                # parameter, so frozen params do not retain stale buffers
+                # through the fixbase epochs
+                optim.zero_grad(set_to_none=True)
+                if name not in self._orig_param_groups:
+                    self._orig_param_groups[name] = [group['params'] for group in optim.param_groups]
+                for group, orig_params in zip(optim.param_groups, self._orig_param_groups[name]):
+                    for p in orig_params:
+                        if not p.requires_grad:
+                            optim.state.pop(p, None)
+                    # the group dicts themselves stay installed, so lr and
+                    # other hyperparameters the scheduler writes during the
+                    # fixbase phase survive; only the params lists change
+                    group['params'] = [p for p in orig_params if p.requires_grad]
+            else:
+                orig = self._orig_param_groups.pop(name, None)
+                if orig is not None:
+                    for group, orig_params in zip(optim.param_groups, orig):
+                        group['params'] = orig_params
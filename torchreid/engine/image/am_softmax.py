@@ -43,7 +43,8 @@ class ImageAMSoftmaxEngine(Engine):
                  reformulate=False, aug_prob=1., conf_penalty=False, pr_product=False, m=0.35, s=10, compute_s=False, end_s=None,
                  duration_s=None, skip_steps_s=None, enable_masks=False, adaptive_margins=False, class_weighting=False,
                  attr_cfg=None, base_num_classes=-1, symmetric_ce=False, mix_weight=1.0, enable_rsc=False, enable_sam=False,
-                 should_freeze_aux_models=False, nncf_metainfo=None, initial_lr=None, use_ema_decay=False, ema_decay=0.999):
+                 should_freeze_aux_models=False, nncf_metainfo=None, initial_lr=None, use_ema_decay=False, ema_decay=0.999,
+                 use_amp=False, channels_last=False):
         super(ImageAMSoftmaxEngine, self).__init__(datamanager,
                                                    models=models,
                                                    optimizers=optimizers,
@@ -57,9 +58,12 @@ class ImageAMSoftmaxEngine(Engine):
                                                    nncf_metainfo=nncf_metainfo,
                                                    initial_lr=initial_lr,
                                                    use_ema_decay=use_ema_decay,
-                                                   ema_decay=ema_decay)
+                                                   ema_decay=ema_decay,
+                                                   use_amp=use_amp,
+                                                   channels_last=channels_last)
 
         assert softmax_type in ['stock', 'am']
+        assert not (self.use_amp and enable_sam), 'SAM cannot be used together with mixed precision'
         assert s > 0.0
         if softmax_type == 'am':
             assert m >= 0.0
@@ -67,6 +71,8 @@ class ImageAMSoftmaxEngine(Engine):
         self.regularizer = get_regularizer(reg_cfg)
         self.enable_metric_losses = metric_cfg.enable
         self.enable_masks = enable_masks
+        # this engine consumes the dict form of the train records
+        self._parse_train = self._build_parse_train(output_dict=True, enable_masks=enable_masks)
         self.mix_weight = mix_weight
         self.enable_rsc = enable_rsc
         self.enable_sam = enable_sam
@@ -74,6 +80,7 @@ class ImageAMSoftmaxEngine(Engine):
         self.aug_prob = aug_prob
         self.aug_index = None
         self.lam = None
+        self._model_streams = None
         self.alpha = alpha
         self.decay_power = decay_power
         self.size =  size
@@ -192,7 +199,7 @@ class ImageAMSoftmaxEngine(Engine):
     def forward_backward(self, data):
         n_iter = self.epoch * self.num_batches + self.batch_idx
 
-        train_records = self.parse_data_for_train(data, True, self.enable_masks, self.use_gpu)
+        train_records = self._parse_train(data)
         imgs = train_records['img']
         obj_ids = train_records['obj_id']
 
@@ -216,49 +223,75 @@ class ImageAMSoftmaxEngine(Engine):
             # this is made just for convinience
             avg_acc = 0.0
             out_logits = [[] for _ in range(self.num_targets)]
-            total_loss = torch.zeros([], dtype=imgs.dtype, device=imgs.device)
             loss_summary = dict()
 
-            for model_name in model_names:
-                self.optims[model_name].zero_grad()
-
-                model_loss, model_loss_summary, model_avg_acc, model_logits = self._single_model_losses(
-                    self.models[model_name], train_records, imgs, obj_ids, n_iter, model_name, num_packages
-                )
-
-                avg_acc += model_avg_acc / float(num_models)
-                total_loss += model_loss / float(num_models)
-                loss_summary.update(model_loss_summary)
-
-                for trg_id in range(self.num_targets):
-                    if model_logits[trg_id] is not None:
-                        out_logits[trg_id].append(model_logits[trg_id])
-
-            if len(model_names) > 1:
-                num_mutual_losses = 0
-                mutual_loss = torch.zeros([], dtype=imgs.dtype, device=imgs.device)
-                for trg_id in range(self.num_targets):
-                    if len(out_logits[trg_id]) <= 1:
-                        continue
-
-                    with torch.no_grad():
-                        trg_probs = torch.softmax(torch.stack(out_logits[trg_id]), dim=2).mean(dim=0)
-
-                    for model_id, logits in enumerate(out_logits[trg_id]):
-                        log_probs = torch.log_softmax(logits, dim=1)
-                        m_loss = (trg_probs * log_probs).sum(dim=1).mean().neg()
-
-                        mutual_loss += m_loss
-                        loss_summary['mutual_{}/{}'.format(trg_id, model_names[model_id])] = m_loss.item()
-                        num_mutual_losses += 1
-
-                should_turn_off_mutual_learning = self._should_turn_off_mutual_learning(self.epoch)
-                coeff_mutual_learning = int(not should_turn_off_mutual_learning)
-
-                total_loss += coeff_mutual_learning * mutual_loss / float(num_mutual_losses)
-
-
-            total_loss.backward(retain_graph=self.enable_metric_losses)
+            use_streams = self.use_gpu and num_models > 1
+            if use_streams and self._model_streams is None:
+                self._model_streams = {name: torch.cuda.Stream() for name in model_names}
+
+            with torch.cuda.amp.autocast(enabled=self.use_amp):
+                total_loss = torch.zeros([], dtype=imgs.dtype, device=imgs.device)
+
+                model_results = dict()
+                if use_streams:
+                    # fork every model stream from the same point so the
+                    # per-model forwards can overlap on the device; no new
+                    # work goes to the current stream until the join below
+                    current_stream = torch.cuda.current_stream()
+                    for model_name in model_names:
+                        self.optims[model_name].zero_grad()
+                        stream = self._model_streams[model_name]
+                        stream.wait_stream(current_stream)
+                        with torch.cuda.stream(stream):
+                            model_results[model_name] = self._single_model_losses(
+                                self.models[model_name], train_records, imgs, obj_ids, n_iter, model_name,
+                                num_packages
+                            )
+                    for stream in self._model_streams.values():
+                        current_stream.wait_stream(stream)
+                else:
+                    for model_name in model_names:
+                        self.optims[model_name].zero_grad()
+                        model_results[model_name] = self._single_model_losses(
+                            self.models[model_name], train_records, imgs, obj_ids, n_iter, model_name, num_packages
+                        )
+
+                for model_name in model_names:
+                    model_loss, model_loss_summary, model_avg_acc, model_logits = model_results[model_name]
+
+                    avg_acc += model_avg_acc / float(num_models)
+                    total_loss += model_loss / float(num_models)
+                    loss_summary.update(model_loss_summary)
+
+                    for trg_id in range(self.num_targets):
+                        if model_logits[trg_id] is not None:
+                            out_logits[trg_id].append(model_logits[trg_id])
+
+                if len(model_names) > 1:
+                    num_mutual_losses = 0
+                    mutual_loss = torch.zeros([], dtype=imgs.dtype, device=imgs.device)
+                    for trg_id in range(self.num_targets):
+                        if len(out_logits[trg_id]) <= 1:
+                            continue
+
+                        with torch.no_grad():
+                            trg_probs = torch.softmax(torch.stack(out_logits[trg_id]), dim=2).mean(dim=0)
+
+                        for model_id, logits in enumerate(out_logits[trg_id]):
+                            log_probs = torch.log_softmax(logits, dim=1)
+                            m_loss = (trg_probs * log_probs).sum(dim=1).mean().neg()
+
+                            mutual_loss += m_loss
+                            loss_summary['mutual_{}/{}'.format(trg_id, model_names[model_id])] = m_loss.detach()
+                            num_mutual_losses += 1
+
+                    should_turn_off_mutual_learning = self._should_turn_off_mutual_learning(self.epoch)
+                    coeff_mutual_learning = int(not should_turn_off_mutual_learning)
+
+                    total_loss += coeff_mutual_learning * mutual_loss / float(num_mutual_losses)
+
+
+            self.scaler.scale(total_loss).backward(retain_graph=self.enable_metric_losses)
 
             for model_name in model_names:
                 for trg_id in range(self.num_targets):
@@ -270,9 +303,17 @@ class ImageAMSoftmaxEngine(Engine):
                 elif isinstance(self.optims[model_name], SAM) and step == 2:
                     self.optims[model_name].second_step()
                 elif not isinstance(self.optims[model_name], SAM) and step == 1:
-                    self.optims[model_name].step()
+                    self._step_optimizer(self.optims[model_name])
+
+            self.scaler.update()
+            loss_summary['loss'] = total_loss.detach()
 
-            loss_summary['loss'] = total_loss.item()
+        # the summary holds detached tensors so that no .item() sync runs
+        # while the per-model streams are still in flight; MetricMeter
+        # batches their host read on update. Only the accuracy needs a
+        # scalar here, a single sync after the join.
+        if torch.is_tensor(avg_acc):
+            avg_acc = avg_acc.item()
 
         return loss_summary, avg_acc
 
@@ -301,8 +342,8 @@ class ImageAMSoftmaxEngine(Engine):
             main_loss = self.main_losses[trg_id](trg_logits, trg_obj_ids, aug_index=self.aug_index,
                                                 lam=self.lam, iteration=n_iter, scale=self.scales[model_name])
 
-            avg_acc += metrics.accuracy(trg_logits, trg_obj_ids)[0].item()
-            loss_summary['main_{}/{}'.format(trg_id, model_name)] = main_loss.item()
+            avg_acc += metrics.accuracy(trg_logits, trg_obj_ids)[0]
+            loss_summary['main_{}/{}'.format(trg_id, model_name)] = main_loss.detach()
 
             scaled_trg_logits = self.main_losses[trg_id].get_last_scale() * trg_logits
             out_logits.append(scaled_trg_logits)
@@ -315,7 +356,7 @@ class ImageAMSoftmaxEngine(Engine):
                 ml_loss_module.init_iteration()
                 ml_loss, ml_loss_summary = ml_loss_module(embd, trg_logits, trg_obj_ids, n_iter)
 
-                loss_summary['ml_{}/{}'.format(trg_id, model_name)] = ml_loss.item()
+                loss_summary['ml_{}/{}'.format(trg_id, model_name)] = ml_loss.detach()
                 loss_summary.update(ml_loss_summary)
                 trg_loss += ml_loss
 
@@ -328,7 +369,7 @@ class ImageAMSoftmaxEngine(Engine):
 
                 mixing_loss = (trg_mix_probs * mix_log_probs).sum(dim=2).neg().mean()
 
-                loss_summary['mix_{}/{}'.format(trg_id, model_name)] = mixing_loss.item()
+                loss_summary['mix_{}/{}'.format(trg_id, model_name)] = mixing_loss.detach()
                 trg_loss += self.mix_weight * mixing_loss
 
             total_loss += trg_loss
@@ -353,7 +394,7 @@ class ImageAMSoftmaxEngine(Engine):
                 attr_logits = all_attr_logits[attr_name][valid_attr_mask]
 
                 attr_loss = attr_loss_module(attr_logits, attr_labels, iteration=n_iter)
-                loss_summary['{}/{}'.format(attr_name, model_name)] = attr_loss.item()
+                loss_summary['{}/{}'.format(attr_name, model_name)] = attr_loss.detach()
 
                 total_attr_loss += attr_loss
                 num_attr_losses += 1
@@ -387,13 +428,13 @@ class ImageAMSoftmaxEngine(Engine):
                     att_loss_val += 0.5 * (att_pos_errors + att_neg_errors)
 
             if att_loss_val > 0.0:
-                loss_summary['att/{}'.format(model_name)] = att_loss_val.item()
+                loss_summary['att/{}'.format(model_name)] = att_loss_val.detach()
                 total_loss += att_loss_val
 
         if self.regularizer is not None and (self.epoch + 1) > self.fixbase_epoch:
             reg_loss = self.regularizer(model)
 
-            loss_summary['reg/{}'.format(model_name)] = reg_loss.item()
+            loss_summary['reg/{}'.format(model_name)] = reg_loss.detach()
             total_loss += reg_loss
 
         return total_loss, loss_summary, avg_acc, out_logits
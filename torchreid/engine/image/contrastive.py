@@ -29,8 +29,9 @@ class ImageContrastiveEngine(Engine):
     """
 
     def __init__(self, datamanager, model, optimizer, reg_cfg, scheduler=None, use_gpu=False,
-                 s=10, end_s=None, duration_s=None, skip_steps_s=None):
-        super(ImageContrastiveEngine, self).__init__(datamanager, model, optimizer, scheduler, use_gpu)
+                 s=10, end_s=None, duration_s=None, skip_steps_s=None, use_amp=False):
+        super(ImageContrastiveEngine, self).__init__(datamanager, model, optimizer, scheduler, use_gpu,
+                                                     use_amp=use_amp)
 
         self.regularizer = get_regularizer(reg_cfg)
 
@@ -64,49 +65,52 @@ class ImageContrastiveEngine(Engine):
         num_models = len(model_names)
 
         out_embd = [[] for _ in range(self.num_targets)]
-        total_loss = torch.zeros([], dtype=imgs.dtype, device=imgs.device)
         loss_summary = dict()
 
-        for model_name in model_names:
-            self.optims[model_name].zero_grad()
+        with torch.cuda.amp.autocast(enabled=self.use_amp):
+            total_loss = torch.zeros([], dtype=imgs.dtype, device=imgs.device)
+
+            for model_name in model_names:
+                self.optims[model_name].zero_grad()
 
-            model_loss, model_loss_summary, model_embd = self._single_model_losses(
-                self.models[model_name], imgs, dataset_ids, model_name, n_iter
-            )
+                model_loss, model_loss_summary, model_embd = self._single_model_losses(
+                    self.models[model_name], imgs, dataset_ids, model_name, n_iter
+                )
 
-            total_loss += model_loss / float(num_models)
-            loss_summary.update(model_loss_summary)
+                total_loss += model_loss / float(num_models)
+                loss_summary.update(model_loss_summary)
 
-            for trg_id in range(self.num_targets):
-                if model_embd[trg_id] is not None:
-                    out_embd[trg_id].append(model_embd[trg_id])
+                for trg_id in range(self.num_targets):
+                    if model_embd[trg_id] is not None:
+                        out_embd[trg_id].append(model_embd[trg_id])
 
-        if len(model_names) > 1:
-            num_mutual_losses = 0
-            mutual_loss = torch.zeros([], dtype=imgs.dtype, device=imgs.device)
-            for trg_id in range(self.num_targets):
-                if len(out_embd[trg_id]) <= 1:
-                    continue
+            if len(model_names) > 1:
+                num_mutual_losses = 0
+                mutual_loss = torch.zeros([], dtype=imgs.dtype, device=imgs.device)
+                for trg_id in range(self.num_targets):
+                    if len(out_embd[trg_id]) <= 1:
+                        continue
 
-                with torch.no_grad():
-                    trg_embd = torch.stack(out_embd[trg_id]).mean(dim=0)
-                    trg_norm_embd = F.normalize(trg_embd, p=2, dim=1)
+                    with torch.no_grad():
+                        trg_embd = torch.stack(out_embd[trg_id]).mean(dim=0)
+                        trg_norm_embd = F.normalize(trg_embd, p=2, dim=1)
 
-                for model_id, embd in enumerate(out_embd[trg_id]):
-                    norm_embd = F.normalize(embd, p=2, dim=1)
-                    m_losses = 1.0 - (trg_norm_embd * norm_embd).sum(dim=1)
-                    m_loss = m_losses.mean()
+                    for model_id, embd in enumerate(out_embd[trg_id]):
+                        norm_embd = F.normalize(embd, p=2, dim=1)
+                        m_losses = 1.0 - (trg_norm_embd * norm_embd).sum(dim=1)
+                        m_loss = m_losses.mean()
 
-                    mutual_loss += m_loss
-                    loss_summary['mutual_{}/{}'.format(trg_id, model_names[model_id])] = m_loss.item()
-                    num_mutual_losses += 1
+                        mutual_loss += m_loss
+                        loss_summary['mutual_{}/{}'.format(trg_id, model_names[model_id])] = m_loss.item()
+                        num_mutual_losses += 1
 
-            total_loss += mutual_loss / float(num_mutual_losses)
+                total_loss += mutual_loss / float(num_mutual_losses)
 
-        total_loss.backward()
+        self.scaler.scale(total_loss).backward()
 
         for model_name in model_names:
-            self.optims[model_name].step()
+            self._step_optimizer(self.optims[model_name])
+        self.scaler.update()
 
         loss_summary['loss'] = total_loss.item()
 
@@ -153,8 +157,8 @@ class ImageContrastiveEngine(Engine):
         assert len(imgs.size()) == 5
 
         if use_gpu:
-            imgs = imgs.cuda()
-            dataset_ids = dataset_ids.cuda()
+            imgs = imgs.cuda(non_blocking=True)
+            dataset_ids = dataset_ids.cuda(non_blocking=True)
 
         b, num_packages, c, h, w = imgs.size()
         assert num_packages == 2
@@ -62,9 +62,11 @@ class ImageSoftmaxEngine(Engine):
         scheduler=None,
         use_gpu=True,
         label_smooth=True,
-        conf_penalty=0.0
+        conf_penalty=0.0,
+        use_amp=False
     ):
-        super(ImageSoftmaxEngine, self).__init__(datamanager, model, optimizer, scheduler, use_gpu)
+        super(ImageSoftmaxEngine, self).__init__(datamanager, model, optimizer, scheduler, use_gpu,
+                                                 use_amp=use_amp)
 
         self.main_real_loss = CrossEntropyLoss(
             use_gpu=self.use_gpu,
@@ -73,10 +75,7 @@ class ImageSoftmaxEngine(Engine):
         )
 
     def forward_backward(self, data):
-        imgs, pids = self.parse_data_for_train(data)
-        if self.use_gpu:
-            imgs = imgs.cuda()
-            pids = pids.cuda()
+        imgs, pids = self._parse_train(data)
 
         model_names = self.get_model_names()
         num_models = len(model_names)
@@ -84,36 +83,39 @@ class ImageSoftmaxEngine(Engine):
         all_losses, all_logits = [], []
         loss_summary = dict()
 
-        for model_name in model_names:
-            self.optims[model_name].zero_grad()
+        with torch.cuda.amp.autocast(enabled=self.use_amp):
+            for model_name in model_names:
+                self.optims[model_name].zero_grad()
+
+                logits = self.models[model_name](imgs)
+                all_logits.append(logits)
 
-            logits = self.models[model_name](imgs)
-            all_logits.append(logits)
+                loss = self.compute_loss(self.main_real_loss, logits, pids)
+                all_losses.append(loss / float(num_models))
 
-            loss = self.compute_loss(self.main_real_loss, logits, pids)
-            all_losses.append(loss / float(num_models))
+                loss_summary['{}/main'.format(model_name)] = loss.item()
+                loss_summary['{}/acc'.format(model_name)] = metrics.accuracy(logits, pids)[0].item()
 
-            loss_summary['{}/main'.format(model_name)] = loss.item()
-            loss_summary['{}/acc'.format(model_name)] = metrics.accuracy(logits, pids)[0].item()
+            if len(all_logits) > 1:
+                with torch.no_grad():
+                    trg_probs = torch.softmax(torch.stack(all_logits), dim=2).mean(dim=0)
 
-        if len(all_logits) > 1:
-            with torch.no_grad():
-                trg_probs = torch.softmax(torch.stack(all_logits), dim=2).mean(dim=0)
+                mix_loss = 0.0
+                for logits in all_logits:
+                    log_probs = torch.log_softmax(logits, dim=1)
+                    mix_loss += (trg_probs * log_probs).mean().neg()
+                mix_loss /= float(len(all_logits))
 
-            mix_loss = 0.0
-            for logits in all_logits:
-                log_probs = torch.log_softmax(logits, dim=1)
-                mix_loss += (trg_probs * log_probs).mean().neg()
-            mix_loss /= float(len(all_logits))
+                all_losses.append(mix_loss)
+                loss_summary['mix'] = mix_loss.item()
 
-            all_losses.append(mix_loss)
-            loss_summary['mix'] = mix_loss.item()
+            total_loss = sum(all_losses)
 
-        total_loss = sum(all_losses)
-        total_loss.backward()
+        self.scaler.scale(total_loss).backward()
 
         for model_name in model_names:
-            self.optims[model_name].step()
+            self._step_optimizer(self.optims[model_name])
+        self.scaler.update()
 
         loss_summary['loss'] = total_loss.item()
 
@@ -1,5 +1,7 @@
 from __future__ import absolute_import, division, print_function
 
+import torch
+
 from torchreid import metrics
 from torchreid.losses import CrossEntropyLoss, TripletLoss
 from ..engine import Engine
@@ -69,9 +71,11 @@ class ImageTripletEngine(Engine):
         scheduler=None,
         use_gpu=True,
         label_smooth=True,
-        conf_penalty=0.0
+        conf_penalty=0.0,
+        use_amp=False
     ):
-        super(ImageTripletEngine, self).__init__(datamanager, model, optimizer, scheduler, use_gpu)
+        super(ImageTripletEngine, self).__init__(datamanager, model, optimizer, scheduler, use_gpu,
+                                                 use_amp=use_amp)
 
         self.weight_t = weight_t
         self.weight_x = weight_x
@@ -89,20 +93,18 @@ class ImageTripletEngine(Engine):
         self.optimizer = self.optims['model']
 
     def forward_backward(self, data):
-        imgs, pids = self.parse_data_for_train(data)
-
-        if self.use_gpu:
-            imgs = imgs.cuda()
-            pids = pids.cuda()
+        imgs, pids = self._parse_train(data)
 
-        outputs, features = self.model(imgs)
-        loss_t = self.compute_loss(self.criterion_t, features, pids)
-        loss_x = self.compute_loss(self.criterion_x, outputs, pids)
-        loss = self.weight_t * loss_t + self.weight_x * loss_x
+        with torch.cuda.amp.autocast(enabled=self.use_amp):
+            outputs, features = self.model(imgs)
+            loss_t = self.compute_loss(self.criterion_t, features, pids)
+            loss_x = self.compute_loss(self.criterion_x, outputs, pids)
+            loss = self.weight_t * loss_t + self.weight_x * loss_x
 
         self.optimizer.zero_grad()
-        loss.backward()
-        self.optimizer.step()
+        self.scaler.scale(loss).backward()
+        self.scaler.step(self.optimizer)
+        self.scaler.update()
 
         loss_summary = {
             'loss_t': loss_t.item(),
@@ -1,5 +1,7 @@
 from __future__ import absolute_import, division, print_function
 
+import torch
+
 from .am_softmax import AMSoftmaxLoss, AngleSimpleLinear
 from .cross_entropy_loss import CrossEntropyLoss, PseudoCrossEntropyLoss
 from .entropy import MaxEntropyLoss, MinEntropyLoss, entropy
@@ -22,6 +24,15 @@ def DeepSupervision(criterion, xs, y, **kwargs):
         xs: tuple of inputs
         y: ground truth
     """
+    if (getattr(criterion, 'supports_batched_deepsupervision', False)
+            and isinstance(y, torch.Tensor)
+            and all(x.shape == xs[0].shape for x in xs[1:])):
+        # fold the branches into the batch dim and call the criterion once,
+        # turning N small kernels into one large launch; only valid for
+        # stateless mean-reduction criteria that opt in via the attribute
+        stacked = torch.stack(tuple(xs), dim=0).flatten(0, 1)
+        return criterion(stacked, y.repeat(len(xs)), **kwargs)
+
     total_loss = 0.0
     num_losses = 0
     for x in xs:
@@ -1,7 +1,7 @@
 from __future__ import absolute_import
 
 from .tools import *
-from .rerank import re_ranking
+from .rerank import re_ranking, re_ranking_torch
 from .loggers import *
 from .avgmeter import *
 from .reidtools import *
@@ -69,9 +69,16 @@ class MetricMeter(object):
                 'Input to MetricMeter.update() must be a dictionary'
             )
 
+        tensor_keys = [k for k, v in input_dict.items() if isinstance(v, torch.Tensor)]
+        if tensor_keys:
+            # one device sync for all tensor-valued entries instead of
+            # an implicit sync per .item() call
+            values = torch.stack(
+                [input_dict[k].detach().reshape(()) for k in tensor_keys]
+            ).tolist()
+            input_dict = {**input_dict, **dict(zip(tensor_keys, values))}
+
         for k, v in input_dict.items():
-            if isinstance(v, torch.Tensor):
-                v = v.item()
             self.meters[k].update(v)
 
     def __str__(self):
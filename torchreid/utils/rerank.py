@@ -25,8 +25,9 @@ Returns:
 from __future__ import absolute_import, division, print_function
 
 import numpy as np
+import torch
 
-__all__ = ['re_ranking']
+__all__ = ['re_ranking', 're_ranking_torch']
 
 
 def re_ranking(q_g_dist, q_q_dist, g_g_dist, k1=20, k2=6, lambda_value=0.3):
@@ -112,3 +113,72 @@ def re_ranking(q_g_dist, q_q_dist, g_g_dist, k1=20, k2=6, lambda_value=0.3):
     del jaccard_dist
     final_dist = final_dist[:query_num, query_num:]
     return final_dist
+
+
+def re_ranking_torch(q_g_dist, q_q_dist, g_g_dist, k1=20, k2=6, lambda_value=0.3):
+    """Torch port of ``re_ranking`` working on CPU or GPU tensors.
+
+    The k-nearest neighbors are selected with ``torch.topk`` instead of a full
+    argsort and the k-reciprocal expansion is expressed through boolean masks
+    and matrix products, so the whole pipeline runs as batched tensor ops.
+    Inputs and the returned distance matrix are torch tensors on the device of
+    ``q_g_dist``.
+    """
+
+    original_dist = torch.cat(
+        [
+            torch.cat([q_q_dist, q_g_dist], dim=1),
+            torch.cat([q_g_dist.t(), g_g_dist], dim=1)
+        ],
+        dim=0
+    )
+    original_dist = original_dist.float().pow(2)
+    original_dist = (original_dist / original_dist.max(dim=0).values).t().contiguous()
+
+    query_num = q_g_dist.size(0)
+    all_num = original_dist.size(0)
+    k1_half = int(np.around(k1 / 2.))
+
+    # only the first k1 + 1 neighbors are ever used, so topk replaces the full argsort
+    initial_rank = torch.topk(original_dist, k1 + 1, dim=1, largest=False).indices
+
+    # forward_mask[i, j]: j is among the k1 + 1 nearest neighbors of i
+    forward_mask = torch.zeros((all_num, all_num), dtype=torch.bool, device=original_dist.device)
+    forward_mask.scatter_(1, initial_rank, True)
+    reciprocal = forward_mask & forward_mask.t()
+
+    half_mask = torch.zeros_like(forward_mask)
+    half_mask.scatter_(1, initial_rank[:, :k1_half + 1], True)
+    reciprocal_half = half_mask & half_mask.t()
+
+    # candidate j of row i extends the set when |R_half(j) & R(i)| > 2/3 |R_half(j)|
+    overlap = reciprocal.float().mm(reciprocal_half.float().t())
+    half_sizes = reciprocal_half.sum(dim=1).float()
+    qualified = reciprocal & (overlap > 2. / 3 * half_sizes.unsqueeze(0))
+    expansion = reciprocal | qualified.float().mm(reciprocal_half.float()).bool()
+    del forward_mask, half_mask, overlap, qualified
+
+    weight = torch.exp(-original_dist) * expansion.float()
+    V = weight / weight.sum(dim=1, keepdim=True)
+    del reciprocal, reciprocal_half, expansion, weight
+
+    if k2 != 1:
+        V_qe = torch.empty_like(V)
+        for chunk in torch.arange(all_num, device=V.device).split(1024):
+            V_qe[chunk] = V[initial_rank[chunk, :k2]].mean(dim=1)
+        V = V_qe
+        del V_qe
+    del initial_rank
+
+    original_dist = original_dist[:query_num]
+    jaccard_dist = torch.zeros_like(original_dist)
+
+    for i in range(query_num):
+        ind_non_zero = V[i].nonzero(as_tuple=True)[0]
+        temp_min = torch.min(V[i, ind_non_zero].unsqueeze(0), V[:, ind_non_zero]).sum(dim=1)
+        jaccard_dist[i] = 1 - temp_min / (2. - temp_min)
+
+    final_dist = jaccard_dist * (1 - lambda_value) + original_dist * lambda_value
+    del original_dist, V, jaccard_dist
+
+    return final_dist[:, query_num:]
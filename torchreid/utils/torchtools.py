@@ -2,7 +2,9 @@ from __future__ import absolute_import, division, print_function
 import os
 import os.path as osp
 import pickle
+import queue
 import shutil
+import threading
 import warnings
 from collections import OrderedDict
 from functools import partial
@@ -15,7 +17,7 @@ from torch.nn.modules import module
 from .tools import mkdir_if_missing, check_isfile
 
 __all__ = [
-    'save_checkpoint', 'load_checkpoint', 'resume_from_checkpoint',
+    'save_checkpoint', 'CheckpointWriter', 'load_checkpoint', 'resume_from_checkpoint',
     'open_all_layers', 'open_specified_layers', 'count_num_param',
     'load_pretrained_weights', 'EMA'
 ]
@@ -68,6 +70,58 @@ def save_checkpoint(
     return fpath
 
 
+class CheckpointWriter:
+    """Writes checkpoints from a background thread.
+
+    Serializing a state dict to disk takes seconds for large models and
+    blocks the training loop when done inline. This class accepts
+    ready-to-dump states over a bounded queue and calls
+    :func:`save_checkpoint` from a daemon thread, so disk I/O overlaps
+    the next epoch's compute. The caller is responsible for snapshotting
+    the state (detached CPU copies) before enqueueing it.
+    """
+
+    def __init__(self, max_pending=2):
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                break
+            state, save_dir, is_best, name, sym_links = item
+            try:
+                fpath = save_checkpoint(state, save_dir, is_best=is_best, name=name)
+                for link_name in sym_links:
+                    if osp.lexists(link_name):
+                        os.remove(link_name)
+                    os.symlink(fpath, link_name)
+            except Exception as e:
+                # a failed write (full disk, transient FS error) must not
+                # kill the worker: later checkpoints may still succeed, and
+                # a dead thread would leave enqueue() blocking forever once
+                # the queue fills up
+                print('WARNING: failed to save checkpoint "{}" to "{}": {}'.format(name, save_dir, e))
+            finally:
+                self._queue.task_done()
+
+    def enqueue(self, state, save_dir, is_best=False, name='model', sym_links=()):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._worker, daemon=True)
+            self._thread.start()
+        self._queue.put((state, save_dir, is_best, name, list(sym_links)))
+
+    def join(self):
+        """Flushes pending writes and stops the worker thread."""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+
 def load_checkpoint(fpath):
     r"""Loads checkpoint.
 
@@ -196,7 +250,8 @@ def open_all_layers(model):
         if p.dtype in (torch.uint8, torch.int8, torch.int16, torch.int32, torch.int64, torch.bool):
             # only Tensors of floating point dtype can require gradients
             continue
-        p.requires_grad = True
+        if not p.requires_grad:
+            p.requires_grad_(True)
 
 
 def open_specified_layers(model, open_layers, strict=True):
@@ -228,14 +283,18 @@ def open_specified_layers(model, open_layers, strict=True):
                 raise ValueError('"{}" is not an attribute of the model, please provide the correct name'.format(layer))
 
     for name, module in model.named_children():
+        # write requires_grad only on actual changes: redundant writes still
+        # go through autograd bookkeeping on the C++ side
         if name in open_layers:
             module.train()
             for p in module.parameters():
-                p.requires_grad = True
+                if not p.requires_grad:
+                    p.requires_grad_(True)
         else:
             module.eval()
             for p in module.parameters():
-                p.requires_grad = False
+                if p.requires_grad:
+                    p.requires_grad_(False)
 
 
 def count_num_param(model):